@@ -19,6 +19,10 @@ async def _start_grpc_server(is_server=False):
         options=[
             ("grpc.max_send_message_length", settings.max_send_message_length_mb * 1024**2),
             ("grpc.max_receive_message_length", settings.max_receive_message_length_mb * 1024**2),
+            # Larger HTTP/2 frames and initial stream window for the upload/filterDataset streams
+            ("grpc.http2.max_frame_size", 1024**2),
+            ("grpc.http2.lookahead_bytes", settings.http2_stream_window_kb * 1024),
+            ("grpc.http2.bdp_probe", 1),
         ],
     )
 
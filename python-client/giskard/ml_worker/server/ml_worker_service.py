@@ -4,12 +4,13 @@ import platform
 import re
 import sys
 import time
-from io import StringIO
+from functools import lru_cache
+from io import BytesIO, StringIO
+from typing import Dict, Optional
 
 import grpc
 import numpy as np
 import pandas as pd
-import pkg_resources
 import psutil
 import tqdm
 
@@ -49,8 +50,21 @@ from giskard.ml_worker.utils.grpc_mapper import deserialize_dataset, deserialize
 from giskard.ml_worker.utils.logging import Timer
 from giskard.path_utils import model_path, dataset_path
 
+if sys.version_info >= (3, 8):
+    from importlib import metadata as importlib_metadata
+else:
+    import importlib_metadata
+
 logger = logging.getLogger(__name__)
 
+# Uploads write chunks straight to the file descriptor, bypassing Python's buffered file layer
+UPLOAD_OPEN_FLAGS = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+
+# Upload progress is reported every few MiB rather than on every chunk
+UPLOAD_PROGRESS_STEP_BYTES = 4 * 1024**2
+
+NAME_NOT_DEFINED_PATTERN = re.compile(r"name '(\w+)' is not defined")
+
 
 def file_already_exists(meta: FileUploadMetadata):
     if meta.file_type == FileType.MODEL:
@@ -62,7 +76,41 @@ def file_already_exists(meta: FileUploadMetadata):
     return path.exists(), path
 
 
+@lru_cache(maxsize=256)
+def compile_user_code(code: str, filename: str):
+    # Test snippets and slice filters are re-run with the same source, parse them once
+    return compile(code, filename, "exec")
+
+
+@lru_cache(maxsize=None)
+def get_platform_info() -> PlatformInfo:
+    uname = platform.uname()
+    return PlatformInfo(
+        machine=uname.machine,
+        node=uname.node,
+        processor=uname.processor,
+        release=uname.release,
+        system=uname.system,
+        version=uname.version,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_python_version() -> str:
+    return platform.python_version()
+
+
+def write_fully(fd, data):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
 class MLWorkerServiceImpl(MLWorkerServicer):
+    # Installed distributions don't change during the worker's lifetime, they're listed once per process
+    _installed_packages: Optional[Dict[str, str]] = None
+
     def __init__(self, port=None, remote=None) -> None:
         super().__init__()
         self.port = port
@@ -76,64 +124,74 @@ class MLWorkerServiceImpl(MLWorkerServicer):
         meta = None
         path = None
         progress = None
-        for upload_msg in request_iterator:
-            if upload_msg.HasField("metadata"):
-                meta = upload_msg.metadata
-                file_exists, path = file_already_exists(meta)
-                if not file_exists:
-                    progress = tqdm.tqdm(
-                        desc=f"Receiving {upload_msg.metadata.name}",
-                        unit="B",
-                        unit_scale=True,
-                        unit_divisor=1024,
-                    )
-                    yield UploadStatus(code=StatusCode.CacheMiss)
-                else:
-                    logger.info(f"File already exists: {path}")
-                    break
-            elif upload_msg.HasField("chunk"):
-                try:
-                    path.parent.mkdir(exist_ok=True, parents=True)
-                    with open(path, "ab") as f:
-                        f.write(upload_msg.chunk.content)
-                    progress.update(len(upload_msg.chunk.content))
-                except Exception as e:
-                    if progress is not None:
-                        progress.close()
-                    logger.exception(f"Failed to upload file {meta.name}", e)
-                    yield UploadStatus(code=StatusCode.Failed)
+        progress_pending_bytes = 0
+        fd = None
+        try:
+            for upload_msg in request_iterator:
+                if upload_msg.HasField("metadata"):
+                    meta = upload_msg.metadata
+                    file_exists, path = file_already_exists(meta)
+                    if not file_exists:
+                        progress = tqdm.tqdm(
+                            desc=f"Receiving {upload_msg.metadata.name}",
+                            unit="B",
+                            unit_scale=True,
+                            unit_divisor=1024,
+                            mininterval=0.5,
+                        )
+                        path.parent.mkdir(exist_ok=True, parents=True)
+                        fd = os.open(path, UPLOAD_OPEN_FLAGS, 0o644)
+                        yield UploadStatus(code=StatusCode.CacheMiss)
+                    else:
+                        logger.info(f"File already exists: {path}")
+                        break
+                elif upload_msg.HasField("chunk"):
+                    try:
+                        write_fully(fd, upload_msg.chunk.content)
+                        progress_pending_bytes += len(upload_msg.chunk.content)
+                        if progress_pending_bytes >= UPLOAD_PROGRESS_STEP_BYTES:
+                            progress.update(progress_pending_bytes)
+                            progress_pending_bytes = 0
+                    except Exception as e:
+                        logger.exception(f"Failed to upload file {meta.name}", e)
+                        yield UploadStatus(code=StatusCode.Failed)
+        finally:
+            if fd is not None:
+                os.close(fd)
+            if progress is not None:
+                progress.update(progress_pending_bytes)
+                progress.close()
 
-        if progress is not None:
-            progress.close()
         yield UploadStatus(code=StatusCode.Ok)
 
     def getInfo(self, request: MLWorkerInfoRequest, context):
         logger.info("Collecting ML Worker info")
-        installed_packages = (
-            {p.project_name: p.version for p in pkg_resources.working_set}
-            if request.list_packages
-            else None
-        )
+        installed_packages = self.get_installed_packages() if request.list_packages else None
         current_process = psutil.Process(os.getpid())
         return MLWorkerInfo(
-            platform=PlatformInfo(
-                machine=platform.uname().machine,
-                node=platform.uname().node,
-                processor=platform.uname().processor,
-                release=platform.uname().release,
-                system=platform.uname().system,
-                version=platform.uname().version,
-            ),
+            platform=get_platform_info(),
             giskard_client_version=giskard.__version__,
             pid=os.getpid(),
             process_start_time=int(current_process.create_time()),
             interpreter=sys.executable,
-            interpreter_version=platform.python_version(),
+            interpreter_version=get_python_version(),
             installed_packages=installed_packages,
             internal_grpc_port=self.port,
             is_remote=self.remote,
         )
 
+    @classmethod
+    def get_installed_packages(cls) -> Dict[str, str]:
+        if cls._installed_packages is None:
+            packages = {}
+            # The first distribution found on sys.path for a given name is the one that gets imported
+            for d in importlib_metadata.distributions():
+                name = d.metadata["Name"]
+                if name:
+                    packages.setdefault(name, d.version)
+            cls._installed_packages = packages
+        return cls._installed_packages
+
     def runTest(self, request: RunTestRequest, context: grpc.ServicerContext) -> TestResultMessage:
         from giskard.ml_worker.testing.functions import GiskardTestFunctions
 
@@ -147,10 +205,10 @@ class MLWorkerServiceImpl(MLWorkerServicer):
             _globals["actual_ds"] = deserialize_dataset(request.actual_ds)
         try:
             timer = Timer()
-            exec(request.code, _globals)
+            exec(compile_user_code(request.code, "<test>"), _globals)
             timer.stop(f"Test {tests.tests_results[0].name}")
         except NameError as e:
-            missing_name = re.findall(r"name '(\w+)' is not defined", str(e))[0]
+            missing_name = NAME_NOT_DEFINED_PATTERN.findall(str(e))[0]
             if missing_name == "reference_ds":
                 raise IllegalArgumentError("Reference Dataset is not specified")
             if missing_name == "actual_ds":
@@ -179,9 +237,9 @@ class MLWorkerServiceImpl(MLWorkerServicer):
         if request.feature_types[text_column] != "text":
             raise ValueError(f"Column {text_column} is not of type text")
         text_document = request.columns[text_column]
-        input_df = pd.DataFrame({k: [v] for k, v in request.columns.items()})
-        if model.feature_names:
-            input_df = input_df[model.feature_names]
+        columns = dict(request.columns)
+        feature_names = model.feature_names or list(columns)
+        input_df = pd.DataFrame([[columns[k] for k in feature_names]], columns=feature_names)
         (list_words, list_weights) = explain_text(
             model, input_df, text_column, text_document, n_samples
         )
@@ -199,7 +257,7 @@ class MLWorkerServiceImpl(MLWorkerServicer):
     def runModelForDataFrame(self, request: RunModelForDataFrameRequest, context):
         model = deserialize_model(request.model)
         ds = GiskardDataset(
-            pd.DataFrame([r.columns for r in request.dataframe.rows]),
+            self.proto_df_to_pandas_df(request.dataframe),
             target=request.target,
             feature_types=request.feature_types,
             column_types=request.column_types,
@@ -208,11 +266,11 @@ class MLWorkerServiceImpl(MLWorkerServicer):
         if model.model_type == "classification":
             return RunModelForDataFrameResponse(
                 all_predictions=self.pandas_df_to_proto_df(predictions.all_predictions),
-                prediction=predictions.prediction.astype(str),
+                prediction=predictions.prediction.astype(str, copy=False),
             )
         else:
             return RunModelForDataFrameResponse(
-                prediction=predictions.prediction.astype(str), raw_prediction=predictions.prediction
+                prediction=predictions.prediction.astype(str, copy=False), raw_prediction=predictions.prediction
             )
 
     def runModel(self, request: RunModelRequest, context) -> RunModelResponse:
@@ -238,33 +296,45 @@ class MLWorkerServiceImpl(MLWorkerServicer):
 
         if model.model_type == "classification":
             results = prediction_results.all_predictions
-            labels = {k: v for k, v in enumerate(model.classification_labels)}
+            labels = np.asarray(model.classification_labels)
             label_serie = dataset.df[dataset.target] if dataset.target else None
             if len(model.classification_labels) > 2 or model.classification_threshold is None:
-                preds_serie = prediction_results.all_predictions.idxmax(axis="columns")
-                sorted_predictions = np.sort(prediction_results.all_predictions.values)
-                abs_diff = pd.Series(
-                    sorted_predictions[:, -1] - sorted_predictions[:, -2], name="absDiff"
+                all_predictions = prediction_results.all_predictions
+                probabilities = all_predictions.to_numpy()
+                preds_serie = pd.Series(
+                    np.asarray(all_predictions.columns)[probabilities.argmax(axis=1)],
+                    index=all_predictions.index,
                 )
+                # Only the two highest probabilities are needed, partition instead of a full sort
+                top_predictions = np.partition(probabilities, -2, axis=1)[:, -2:]
+                abs_diff = pd.Series(top_predictions[:, 1] - top_predictions[:, 0], name="absDiff")
             else:
-                diff = (
-                        prediction_results.all_predictions.iloc[:, 1] - model.classification_threshold
+                all_predictions = prediction_results.all_predictions
+                diff = all_predictions.iloc[:, 1].to_numpy() - model.classification_threshold
+                preds_serie = pd.Series(
+                    labels[(diff >= 0).astype(int)], index=all_predictions.index, name="predictions"
                 )
-                preds_serie = (diff >= 0).astype(int).map(labels).rename("predictions")
-                abs_diff = pd.Series(diff.abs(), name="absDiff")
+                abs_diff = pd.Series(np.abs(diff), index=all_predictions.index, name="absDiff")
             calculated = pd.concat([preds_serie, label_serie, abs_diff], axis=1)
         else:
             results = pd.Series(prediction_results.prediction)
             preds_serie = results
             if dataset.target and dataset.target in dataset.df.columns:
-                target_serie = dataset.df[dataset.target]
-                diff = preds_serie - target_serie
-                diff_percent = pd.Series(diff / target_serie, name="diffPercent")
-                abs_diff = pd.Series(diff.abs(), name="absDiff")
-                abs_diff_percent = pd.Series(abs_diff / target_serie, name="absDiffPercent")
-                calculated = pd.concat(
-                    [preds_serie, target_serie, abs_diff, abs_diff_percent, diff_percent], axis=1
-                )
+                preds = preds_serie.to_numpy()
+                target = dataset.df[dataset.target].to_numpy()
+                diff = preds - target
+                abs_diff = np.abs(diff)
+                # Zero targets give inf/nan percentages, as pandas' division did
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    calculated = pd.DataFrame(
+                        {
+                            0: preds,  # preds_serie is unnamed, pd.concat used to label it 0
+                            dataset.target: target,
+                            "absDiff": abs_diff,
+                            "absDiffPercent": abs_diff / target,
+                            "diffPercent": diff / target,
+                        }
+                    )
             else:
                 calculated = pd.concat([preds_serie], axis=1)
 
@@ -278,15 +348,18 @@ class MLWorkerServiceImpl(MLWorkerServicer):
 
         times = []  # This is an array of chunk execution times for performance stats
         column_types = []
+        column_names = []
 
         for filter_msg in request_iterator:
             if filter_msg.HasField("meta"):
                 meta = filter_msg.meta
                 try:
-                    exec(meta.function, None, filterfunc)
+                    exec(compile_user_code(meta.function, "<filter>"), None, filterfunc)
                 except Exception as e:
                     yield FilterDatasetResponse(code=StatusCode.Failed, error_message=str(e))
                 column_types = meta.column_types
+                # Headers are parsed once, so that chunks can be read as raw bytes without prepending them
+                column_names = pd.read_csv(StringIO(meta.headers), nrows=0).columns.tolist()
                 logger.info(f"Filtering dataset with {meta}")
 
                 def filter_wrapper(row):
@@ -299,15 +372,26 @@ class MLWorkerServiceImpl(MLWorkerServicer):
             elif filter_msg.HasField("data"):
                 logger.info("Got chunk " + str(filter_msg.idx))
                 time_start = time.perf_counter()
-                data_as_string = filter_msg.data.content.decode("utf-8")
-                data_as_string = meta.headers + "\n" + data_as_string
                 # CSV => Dataframe
-                data = StringIO(data_as_string)  # Wrap using StringIO to avoid creating file
-                df = pd.read_csv(data, keep_default_na=False, na_values=["_GSK_NA_"])
+                data = BytesIO(filter_msg.data.content)  # Wrap using BytesIO to avoid creating file
+                df = pd.read_csv(
+                    data,
+                    header=None,
+                    names=column_names,
+                    encoding="utf-8",
+                    keep_default_na=False,
+                    na_values=["_GSK_NA_"],
+                )
                 df = df.astype(column_types)
-                # Iterate over rows, applying filter_row func
                 try:
-                    rows_to_keep = df[df.apply(filter_wrapper, axis=1)].index.array
+                    if "filter_df" in filterfunc:
+                        # Opt-in filter_df func, evaluated on the whole chunk at once
+                        mask = self._filter_chunk(filterfunc["filter_df"], df)
+                    else:
+                        # Iterate over rows, applying filter_row func
+                        mask = df.apply(filter_wrapper, axis=1).to_numpy(dtype=bool)
+                    # Chunks are parsed with a fresh RangeIndex, positions are the row indices
+                    rows_to_keep = np.flatnonzero(mask)
                 except Exception as e:
                     yield FilterDatasetResponse(code=StatusCode.Failed, error_message=str(e))
                 time_end = time.perf_counter()
@@ -320,9 +404,43 @@ class MLWorkerServiceImpl(MLWorkerServicer):
         logger.info(f"Filter dataset finished. Avg chunk time: {sum(times) / len(times)}")
         yield FilterDatasetResponse(code=StatusCode.Ok)
 
+    @staticmethod
+    def _filter_chunk(filter_df, df):
+        """
+        Evaluate a user defined filter_df(df) on a whole chunk. It should return a boolean mask
+        with one value per row, either as a Series indexed like the chunk or as a 1D array.
+        """
+        try:
+            result = filter_df(df)
+        except Exception as e:  # noqa # NOSONAR
+            raise ValueError("Failed to execute user defined filtering function") from e
+        if isinstance(result, pd.Series):
+            if not result.index.equals(df.index):
+                raise ValueError("filter_df should return a mask indexed like the given DataFrame")
+            result = result.to_numpy()
+        result = np.asarray(result)
+        if result.dtype != bool or result.shape != (len(df),):
+            raise ValueError(
+                f"filter_df should return a boolean mask with one value per row, "
+                f"got an array of type {result.dtype} and shape {result.shape}"
+            )
+        return result
+
+    @staticmethod
+    def proto_df_to_pandas_df(proto_df):
+        rows = proto_df.rows
+        if not rows:
+            return pd.DataFrame()
+        # Build the frame column by column rather than from one dict per row. As with one dict per row,
+        # columns are the union of the rows' keys and missing values are NaN.
+        # Lookups use get: indexing a protobuf map would insert missing keys into the request.
+        column_names = dict.fromkeys(name for r in rows for name in r.columns)
+        return pd.DataFrame({name: [r.columns.get(name, np.nan) for r in rows] for name in column_names})
+
     @staticmethod
     def pandas_df_to_proto_df(df):
-        return DataFrame(rows=[DataRow(columns=r.astype(str).to_dict()) for _, r in df.iterrows()])
+        records = df.astype(str).to_dict(orient="records")
+        return DataFrame(rows=[DataRow(columns=r) for r in records])
 
     @staticmethod
     def pandas_series_to_proto_series(self, series):
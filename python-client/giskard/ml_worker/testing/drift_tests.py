@@ -3,64 +3,152 @@ from typing import Union
 
 import re
 import uuid
-from collections import Counter
 
 import numpy as np
 import pandas as pd
-from scipy.stats import chi2, ks_2samp
+from scipy.stats import chi2, ks_2samp, kstwo
 from scipy.stats.stats import Ks_2sampResult, wasserstein_distance
 
 from giskard.ml_worker.core.giskard_dataset import GiskardDataset
-from giskard.ml_worker.core.model import GiskardModel
-from giskard.ml_worker.generated.ml_worker_pb2 import SingleTestResult, TestMessage, TestMessageType
+from giskard.ml_worker.core.model import GiskardModel, ModelPredictionResults
+from giskard.ml_worker.generated.ml_worker_pb2 import (
+    NamedSingleTestResult,
+    SingleTestResult,
+    TestMessage,
+    TestMessageType,
+)
 from giskard.ml_worker.testing.abstract_test_collection import AbstractTestCollection
 
 
 class DriftTests(AbstractTestCollection):
     # Class Variable
     other_modalities_pattern = "^other_modalities_[a-z0-9]{32}$"
+    other_modalities_regex = re.compile(other_modalities_pattern)
+    predictions_cache_size = 32
+    sorted_cache_size = 64
+    # Up to this sample size, ks_2samp computes the exact p-value instead of the asymptotic one
+    ks_exact_max_size = 10000
+
+    def __init__(self, test_results: typing.List[NamedSingleTestResult]) -> None:
+        super().__init__(test_results)
+        self._predictions_cache = {}
+        self._sorted_cache = {}
+
+    @staticmethod
+    def _cached(cache, max_size, key, owners, compute):
+        """
+        Small FIFO cache keyed on object ids: the owners of the key are kept alongside the computed
+        value so that their ids can't be reused while the entry exists
+        """
+        if key not in cache:
+            if len(cache) >= max_size:
+                del cache[next(iter(cache))]
+            cache[key] = (owners, compute())
+        return cache[key][-1]
+
+    def _predict(self, model: GiskardModel, dataset: GiskardDataset) -> ModelPredictionResults:
+        """
+        Prediction drift tests are usually run together on the same model and slices, predictions are
+        computed once per (model, dataset) and reused. Replacing dataset.df invalidates the entry.
+        """
+        return self._cached(
+            self._predictions_cache,
+            self.predictions_cache_size,
+            (id(model), id(dataset), id(dataset.df)),
+            (model, dataset, dataset.df),
+            lambda: model.run_predict(dataset),
+        )
+
+    def _predict_values(self, model: GiskardModel, dataset: GiskardDataset, classification_label):
+        """
+        Probabilities of classification_label for classification models, predictions otherwise
+        """
+        predictions = self._predict(model, dataset)
+        if model.model_type == "classification":
+            return predictions.all_predictions[classification_label].to_numpy()
+        return np.asarray(predictions.prediction)
+
+    def _sorted_values(self, values, owner, key=None):
+        """
+        KS and earth mover's distance tests are usually run together on the same columns or predictions
+        and both need the sorted samples: they're sorted once per (owner, key) and reused. The owner is
+        the column series or the prediction results, which are expected not to be modified in place.
+        """
+        return self._cached(
+            self._sorted_cache, self.sorted_cache_size, (id(owner), key), owner, lambda: np.sort(values)
+        )
+
+    def _sorted_predictions(self, model: GiskardModel, dataset: GiskardDataset, classification_label):
+        return self._sorted_values(
+            self._predict_values(model, dataset, classification_label),
+            self._predict(model, dataset),
+            classification_label,
+        )
 
     @staticmethod
-    def _calculate_psi(category, actual_distribution, expected_distribution):
+    def _calculate_psi(actual_distribution, expected_distribution):
         # To use log and avoid zero distribution probability,
         # we bound distribution probability by min_distribution_probability
         min_distribution_probability = 0.0001
 
-        expected_distribution_bounded = max(
-            expected_distribution[category], min_distribution_probability
+        expected_distribution_bounded = np.maximum(
+            expected_distribution, min_distribution_probability
         )
-        actual_distribution_bounded = max(
-            actual_distribution[category], min_distribution_probability
+        actual_distribution_bounded = np.maximum(
+            actual_distribution, min_distribution_probability
         )
-        modality_psi = (expected_distribution_bounded - actual_distribution_bounded) * np.log(
+        return (expected_distribution_bounded - actual_distribution_bounded) * np.log(
             expected_distribution_bounded / actual_distribution_bounded
         )
-        return modality_psi
+
+    @staticmethod
+    def _count_modalities(series):
+        """
+        Counts the occurrences of every modality of the series, in order of first appearance
+        """
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Categorical series are counted on their integer codes, missing values have code -1
+            codes = series.cat.codes.to_numpy()
+            present_codes = pd.unique(codes)
+            categories = series.cat.categories
+            if (present_codes < 0).any():
+                # Code -1 takes the trailing NaN
+                categories = categories.insert(len(categories), np.nan)
+            return pd.Series(
+                np.bincount(codes + 1)[present_codes + 1], index=categories.take(present_codes)
+            )
+        # pd.value_counts accepts both Series and the raw prediction arrays
+        return pd.value_counts(series, sort=False, dropna=False)
 
     @staticmethod
     def _calculate_frequencies(actual_series, reference_series, max_categories=None):
-        all_modalities = list(set(reference_series).union(set(actual_series)))
+        var_count_expected = DriftTests._count_modalities(reference_series)
+        var_count_actual = DriftTests._count_modalities(actual_series)
+        all_modalities = var_count_expected.index.union(var_count_actual.index)
         if max_categories is not None and len(all_modalities) > max_categories:
-            var_count_expected = dict(Counter(reference_series).most_common(max_categories))
+            # Ties are broken by first appearance in the reference series, as Counter.most_common does
+            var_count_expected = var_count_expected.nlargest(max_categories)
             other_modalities_key = "other_modalities_" + uuid.uuid1().hex
-            var_count_expected[other_modalities_key] = len(reference_series) - sum(
-                var_count_expected.values()
-            )
-            categories_list = list(var_count_expected.keys())
-
-            var_count_actual = Counter(actual_series)
             # For test data, we take the same category names as expected_data
-            var_count_actual = {i: var_count_actual[i] for i in categories_list}
-            var_count_actual[other_modalities_key] = len(actual_series) - sum(
-                var_count_actual.values()
-            )
+            var_count_actual = var_count_actual.reindex(var_count_expected.index, fill_value=0)
 
-            all_modalities = categories_list
+            all_modalities = var_count_expected.index.tolist() + [other_modalities_key]
+            expected_frequencies = np.append(
+                var_count_expected.to_numpy(dtype=np.int64, copy=False),
+                len(reference_series) - var_count_expected.sum(),
+            )
+            actual_frequencies = np.append(
+                var_count_actual.to_numpy(dtype=np.int64, copy=False),
+                len(actual_series) - var_count_actual.sum(),
+            )
         else:
-            var_count_expected = Counter(reference_series)
-            var_count_actual = Counter(actual_series)
-        expected_frequencies = np.array([var_count_expected[i] for i in all_modalities])
-        actual_frequencies = np.array([var_count_actual[i] for i in all_modalities])
+            expected_frequencies = var_count_expected.reindex(all_modalities, fill_value=0).to_numpy(
+                dtype=np.int64, copy=False
+            )
+            actual_frequencies = var_count_actual.reindex(all_modalities, fill_value=0).to_numpy(
+                dtype=np.int64, copy=False
+            )
+            all_modalities = all_modalities.tolist()
         return all_modalities, actual_frequencies, expected_frequencies
 
     @staticmethod
@@ -72,46 +160,57 @@ class DriftTests(AbstractTestCollection):
         ) = DriftTests._calculate_frequencies(actual_series, reference_series, max_categories)
         expected_distribution = expected_frequencies / len(reference_series)
         actual_distribution = actual_frequencies / len(actual_series)
-        total_psi = 0
-        output_data = pd.DataFrame(
-            columns=["Modality", "Reference_distribution", "Actual_distribution", "Psi"]
-        )
-        for category in range(len(all_modalities)):
-            modality_psi = DriftTests._calculate_psi(
-                category, actual_distribution, expected_distribution
-            )
-
-            total_psi += modality_psi
-            row = {
-                "Modality": all_modalities[category],
-                "Reference_distribution": expected_distribution[category],
-                "Actual_distribution": expected_distribution[category],
-                "Psi": modality_psi,
-            }
-
-            output_data = output_data.append(pd.Series(row), ignore_index=True)
-        return total_psi, output_data
+        psi_values = DriftTests._calculate_psi(actual_distribution, expected_distribution)
+        total_psi = float(psi_values.sum())
+        return total_psi, psi_values, all_modalities
 
     @staticmethod
-    def _calculate_ks(actual_series, reference_series) -> Ks_2sampResult:
-        return ks_2samp(reference_series, actual_series)
+    def _calculate_ks(actual_series, reference_series, presorted=False) -> Ks_2sampResult:
+        if presorted:
+            reference_values, actual_values = np.asarray(reference_series), np.asarray(actual_series)
+        else:
+            reference_values, actual_values = np.sort(reference_series), np.sort(actual_series)
+        n_reference, n_actual = reference_values.size, actual_values.size
+        if max(n_reference, n_actual) <= DriftTests.ks_exact_max_size:
+            return ks_2samp(reference_values, actual_values)
+
+        # Same statistic and asymptotic p-value as ks_2samp, computed from the already sorted samples
+        all_values = np.concatenate([reference_values, actual_values])
+        cdf_diff = (
+            np.searchsorted(reference_values, all_values, side="right") / n_reference
+            - np.searchsorted(actual_values, all_values, side="right") / n_actual
+        )
+        statistic = np.abs(cdf_diff).max()
+        pvalue = kstwo.sf(statistic, np.round(n_reference * n_actual / (n_reference + n_actual)))
+        return Ks_2sampResult(statistic, np.clip(pvalue, 0, 1))
 
     @staticmethod
-    def _calculate_earth_movers_distance(actual_series, reference_series):
-        unique_reference = np.unique(reference_series)
-        unique_actual = np.unique(actual_series)
-        sample_space = list(set(unique_reference).union(set(unique_actual)))
-        val_max = max(sample_space)
-        val_min = min(sample_space)
+    def _calculate_earth_movers_distance(actual_series, reference_series, presorted=False):
+        reference_values = np.asarray(reference_series)
+        actual_values = np.asarray(actual_series)
+        reference_min, reference_max = reference_values.min(), reference_values.max()
+        actual_min, actual_max = actual_values.min(), actual_values.max()
+        val_max = max(reference_max, actual_max)
+        val_min = min(reference_min, actual_min)
         if val_max == val_min:
             metric = 0
+        elif reference_min == reference_max and actual_min == actual_max:
+            # Two different constant samples are normalized to 0 and 1
+            metric = 1.0
         else:
             # Normalizing reference_series and actual_series for comparison purposes
-            reference_series = (reference_series - val_min) / (val_max - val_min)
-            actual_series = (actual_series - val_min) / (val_max - val_min)
-
-            metric = wasserstein_distance(reference_series, actual_series)
-        return metric
+            reference_values = (reference_values - val_min) / (val_max - val_min)
+            actual_values = (actual_values - val_min) / (val_max - val_min)
+
+            if reference_values.size == actual_values.size:
+                # With samples of the same size, the 1D Wasserstein distance is the mean
+                # absolute difference between the sorted samples
+                if not presorted:
+                    reference_values, actual_values = np.sort(reference_values), np.sort(actual_values)
+                metric = np.mean(np.abs(reference_values - actual_values))
+            else:
+                metric = wasserstein_distance(reference_values, actual_values)
+        return float(metric)
 
     @staticmethod
     def _calculate_chi_square(actual_series, reference_series, max_categories):
@@ -120,50 +219,34 @@ class DriftTests(AbstractTestCollection):
             actual_frequencies,
             expected_frequencies,
         ) = DriftTests._calculate_frequencies(actual_series, reference_series, max_categories)
-        chi_square = 0
         # it's necessary for comparison purposes to normalize expected_frequencies
         # so that reference and actual has the same size
         # See https://github.com/scipy/scipy/blob/v1.8.0/scipy/stats/_stats_py.py#L6787
         k_norm = actual_series.shape[0] / reference_series.shape[0]
-        output_data = pd.DataFrame(
-            columns=["Modality", "Reference_frequencies", "Actual_frequencies", "Chi_square"]
-        )
-        for i in range(len(all_modalities)):
-            chi_square_value = (actual_frequencies[i] - expected_frequencies[i] * k_norm) ** 2 / (
-                expected_frequencies[i] * k_norm
-            )
-            chi_square += chi_square_value
-
-            row = {
-                "Modality": all_modalities[i],
-                "Reference_frequencies": expected_frequencies[i],
-                "Actual_frequencies": actual_frequencies[i],
-                "Chi_square": chi_square_value,
-            }
-
-            output_data = output_data.append(pd.Series(row), ignore_index=True)
+        normalized_expected_frequencies = expected_frequencies * k_norm
+        chi_square_values = (
+            actual_frequencies - normalized_expected_frequencies
+        ) ** 2 / normalized_expected_frequencies
+        chi_square = float(chi_square_values.sum())
         # if reference_series and actual_series has only one modality it turns nan (len(all_modalities)=1)
-        if len(all_modalities) > 1:
-            chi_cdf = chi2.cdf(chi_square, len(all_modalities) - 1)
-            p_value = 1 - chi_cdf if chi_cdf != 0 else 0
-        else:
-            p_value = 0
-        return chi_square, p_value, output_data
+        p_value = float(chi2.sf(chi_square, len(all_modalities) - 1)) if len(all_modalities) > 1 else 0
+        return chi_square, p_value, chi_square_values, all_modalities
 
     @staticmethod
     def _validate_column_type(gsk_dataset, column_name, column_type):
-        assert (
-            gsk_dataset.feature_types[column_name] == column_type
-        ), f'Column "{column_name}" is not of type "{column_type}"'
+        if gsk_dataset.feature_types[column_name] != column_type:
+            raise AssertionError(f'Column "{column_name}" is not of type "{column_type}"')
 
     @staticmethod
     def _validate_column_name(actual_ds, reference_ds, column_name):
-        assert (
-            column_name in actual_ds.columns
-        ), f'"{column_name}" is not a column of Actual Dataset Columns: {", ".join(actual_ds.columns)}'
-        assert (
-            column_name in reference_ds.columns
-        ), f'"{column_name}" is not a column of Reference Dataset Columns: {", ".join(reference_ds.columns)}'
+        if column_name not in actual_ds.columns:
+            raise AssertionError(
+                f'"{column_name}" is not a column of Actual Dataset Columns: {", ".join(actual_ds.columns)}'
+            )
+        if column_name not in reference_ds.columns:
+            raise AssertionError(
+                f'"{column_name}" is not a column of Reference Dataset Columns: {", ".join(reference_ds.columns)}'
+            )
 
     @staticmethod
     def _validate_series_notempty(actual_series, reference_series):
@@ -173,8 +256,6 @@ class DriftTests(AbstractTestCollection):
             raise ValueError("Reference Series computed from the column is empty")
 
     def _extract_series(self, actual_ds, reference_ds, column_name, column_type):
-        actual_ds.df.reset_index(drop=True, inplace=True)
-        reference_ds.df.reset_index(drop=True, inplace=True)
         self._validate_column_name(actual_ds, reference_ds, column_name)
         self._validate_column_type(actual_ds, column_name, column_type)
         self._validate_column_type(reference_ds, column_name, column_type)
@@ -223,6 +304,9 @@ class DriftTests(AbstractTestCollection):
                 The total psi score between the actual and reference datasets
             passed:
                 TRUE if total_psi <= threshold
+            messages:
+                The drifting modalities, only reported when the test fails or no threshold is given:
+                a passing test doesn't return "is drifting" messages
         """
         actual_series, reference_series = self._extract_series(
             actual_ds, reference_ds, column_name, "category"
@@ -247,6 +331,104 @@ class DriftTests(AbstractTestCollection):
             )
         )
 
+    def test_drift_psi_columns(
+        self,
+        reference_ds: GiskardDataset,
+        actual_ds: GiskardDataset,
+        column_names: typing.List[str],
+        threshold=0.2,
+        max_categories: int = 20,
+        psi_contribution_percent: float = 0.2,
+    ) -> SingleTestResult:
+        """
+        Test if the PSI scores between the actual and reference datasets are below the threshold for
+        several categorical features at once
+
+        Example : The test is passed when the PSI scores of gender and marital status between reference
+        and actual sets are both below 0.2
+
+        Args:
+            actual_ds(GiskardDataset):
+                Actual dataset to compute the test
+            reference_ds(GiskardDataset):
+                Reference dataset to compute the test
+            column_names(List[str]):
+                Names of the columns with categorical features
+            threshold(float):
+                Threshold value for the PSI of each column
+            max_categories:
+                the maximum categories to compute the PSI score of each column
+            psi_contribution_percent:
+                the ratio between the PSI score of a given category over the total PSI score
+                of its categorical variable. If there is a drift, the test provides all the
+                categories that have a PSI contribution over than this ratio.
+
+        Returns:
+            actual_slices_size:
+                Length of rows in actual slice
+            reference_slices_size:
+                Length of rows in reference slice
+            metric:
+                The highest total psi score among the columns
+            props:
+                The total psi score of each column
+            passed:
+                TRUE if the total psi of every column <= threshold
+            messages:
+                The drifting modalities of each column, only reported for the columns whose total psi
+                is above the threshold or when no threshold is given: a passing test doesn't return
+                "is drifting" messages
+        """
+        if not column_names:
+            raise ValueError("At least one column name should be provided")
+        if threshold is not None:
+            threshold = float(threshold)
+
+        frequencies = []
+        for column_name in column_names:
+            actual_series, reference_series = self._extract_series(
+                actual_ds, reference_ds, column_name, "category"
+            )
+            frequencies.append(
+                self._calculate_frequencies(actual_series, reference_series, max_categories)
+            )
+
+        # Distributions of all columns are stacked in a single array, padded with zeros
+        # that don't contribute to the PSI, so that it's computed in one pass
+        width = max(len(all_modalities) for all_modalities, _, _ in frequencies)
+        actual_distribution = np.zeros((len(column_names), width))
+        expected_distribution = np.zeros((len(column_names), width))
+        for i, (all_modalities, actual_frequencies, expected_frequencies) in enumerate(frequencies):
+            actual_distribution[i, : len(all_modalities)] = actual_frequencies / len(actual_ds)
+            expected_distribution[i, : len(all_modalities)] = expected_frequencies / len(reference_ds)
+        psi_values = self._calculate_psi(actual_distribution, expected_distribution)
+        total_psi = psi_values.sum(axis=1)
+        max_psi = float(total_psi.max())
+
+        messages = []
+        for i, (column_name, (all_modalities, _, _)) in enumerate(zip(column_names, frequencies)):
+            # A column's drifting modalities are only reported when it fails or has no threshold
+            if threshold is not None and total_psi[i] <= threshold:
+                continue
+            column_messages = self._generate_message_modalities(
+                all_modalities,
+                psi_values[i, : len(all_modalities)] > psi_contribution_percent * total_psi[i],
+                f'data of column "{column_name}"',
+            )
+            if column_messages:
+                messages.extend(column_messages)
+
+        return self.save_results(
+            SingleTestResult(
+                actual_slices_size=[len(actual_ds)],
+                reference_slices_size=[len(reference_ds)],
+                passed=threshold is None or max_psi <= threshold,
+                metric=max_psi,
+                props={name: str(psi) for name, psi in zip(column_names, total_psi)},
+                messages=messages or None,
+            )
+        )
+
     def test_drift_chi_square(
         self,
         reference_ds: GiskardDataset,
@@ -289,6 +471,9 @@ class DriftTests(AbstractTestCollection):
                 The pvalue of chi square test
             passed:
                 TRUE if metric > threshold
+            messages:
+                The drifting modalities, only reported when the test fails or no threshold is given:
+                a passing test doesn't return "is drifting" messages
         """
         actual_series, reference_series = self._extract_series(
             actual_ds, reference_ds, column_name, "category"
@@ -348,13 +533,20 @@ class DriftTests(AbstractTestCollection):
             passed:
                 TRUE if metric >= threshold
         """
+        if threshold is not None:
+            threshold = float(threshold)
         actual_series, reference_series = self._extract_series(
             actual_ds, reference_ds, column_name, "numeric"
         )
 
-        result = self._calculate_ks(actual_series, reference_series)
+        result = self._calculate_ks(
+            self._sorted_values(actual_series, actual_series),
+            self._sorted_values(reference_series, reference_series),
+            presorted=True,
+        )
 
-        passed = result.pvalue >= threshold
+        pvalue = float(result.pvalue)
+        passed = threshold is None or pvalue >= threshold
 
         messages = self._generate_message_ks(passed, result, threshold, "data")
 
@@ -363,7 +555,7 @@ class DriftTests(AbstractTestCollection):
                 actual_slices_size=[len(actual_series)],
                 reference_slices_size=[len(reference_series)],
                 passed=passed,
-                metric=result.pvalue,
+                metric=pvalue,
                 messages=messages,
             )
         )
@@ -403,13 +595,19 @@ class DriftTests(AbstractTestCollection):
             passed:
                 TRUE if metric <= threshold
         """
+        if threshold is not None:
+            threshold = float(threshold)
         actual_series, reference_series = self._extract_series(
             actual_ds, reference_ds, column_name, "numeric"
         )
 
-        metric = self._calculate_earth_movers_distance(actual_series, reference_series)
+        metric = self._calculate_earth_movers_distance(
+            self._sorted_values(actual_series, actual_series),
+            self._sorted_values(reference_series, reference_series),
+            presorted=True,
+        )
 
-        passed = metric <= threshold
+        passed = threshold is None or metric <= threshold
 
         messages: Union[typing.List[TestMessage], None] = None
 
@@ -424,7 +622,7 @@ class DriftTests(AbstractTestCollection):
             SingleTestResult(
                 actual_slices_size=[len(actual_series)],
                 reference_slices_size=[len(reference_series)],
-                passed=True if threshold is None else passed,
+                passed=passed,
                 metric=metric,
                 messages=messages,
             )
@@ -472,12 +670,11 @@ class DriftTests(AbstractTestCollection):
             metric:
                 Total PSI value
             messages:
-                Psi result message
+                The drifting modalities, only reported when the test fails or no threshold is given:
+                a passing test doesn't return "is drifting" messages
         """
-        actual_slice.df.reset_index(drop=True, inplace=True)
-        reference_slice.df.reset_index(drop=True, inplace=True)
-        prediction_reference = pd.Series(model.run_predict(reference_slice).prediction)
-        prediction_actual = pd.Series(model.run_predict(actual_slice).prediction)
+        prediction_reference = self._predict(model, reference_slice).prediction
+        prediction_actual = self._predict(model, actual_slice).prediction
         messages, passed, total_psi = self._test_series_drift_psi(
             prediction_actual,
             prediction_reference,
@@ -506,21 +703,26 @@ class DriftTests(AbstractTestCollection):
         psi_contribution_percent,
         threshold,
     ):
-        total_psi, output_data = self._calculate_drift_psi(
+        if threshold is not None:
+            threshold = float(threshold)
+        total_psi, psi_values, all_modalities = self._calculate_drift_psi(
             actual_series, reference_series, max_categories
         )
-        passed = True if threshold is None else total_psi <= threshold
-        main_drifting_modalities_bool = output_data["Psi"] > psi_contribution_percent * total_psi
-        messages = self._generate_message_modalities(
-            main_drifting_modalities_bool, output_data, test_data
-        )
+        passed = threshold is None or total_psi <= threshold
+        messages = None
+        # The drifting modalities are only reported when the test fails or has no threshold
+        if threshold is None or not passed:
+            messages = self._generate_message_modalities(
+                all_modalities, psi_values > psi_contribution_percent * total_psi, test_data
+            )
         return messages, passed, total_psi
 
     @staticmethod
-    def _generate_message_modalities(main_drifting_modalities_bool, output_data, test_data):
-        modalities_list = output_data[main_drifting_modalities_bool]["Modality"].tolist()
+    def _generate_message_modalities(all_modalities, main_drifting_modalities_bool, test_data):
         filtered_modalities = [
-            w for w in modalities_list if not re.match(DriftTests.other_modalities_pattern, w)
+            str(modality)
+            for modality, drifting in zip(all_modalities, main_drifting_modalities_bool)
+            if drifting and not DriftTests.other_modalities_regex.match(str(modality))
         ]
         messages: Union[typing.List[TestMessage], None] = None
         if filtered_modalities:
@@ -574,12 +776,11 @@ class DriftTests(AbstractTestCollection):
             metric:
                 Calculated p-value of Chi_square
             messages:
-                Message describing if prediction is drifting or not
+                The drifting modalities, only reported when the test fails or no threshold is given:
+                a passing test doesn't return "is drifting" messages
         """
-        actual_slice.df.reset_index(drop=True, inplace=True)
-        reference_slice.df.reset_index(drop=True, inplace=True)
-        prediction_reference = pd.Series(model.run_predict(reference_slice).prediction)
-        prediction_actual = pd.Series(model.run_predict(actual_slice).prediction)
+        prediction_reference = self._predict(model, reference_slice).prediction
+        prediction_actual = self._predict(model, actual_slice).prediction
 
         messages, p_value, passed = self._test_series_drift_chi(
             prediction_actual,
@@ -609,16 +810,20 @@ class DriftTests(AbstractTestCollection):
         max_categories,
         threshold,
     ):
-        chi_square, p_value, output_data = self._calculate_chi_square(
+        if threshold is not None:
+            threshold = float(threshold)
+        chi_square, p_value, chi_square_values, all_modalities = self._calculate_chi_square(
             actual_series, reference_series, max_categories
         )
-        passed = p_value > threshold
-        main_drifting_modalities_bool = (
-            output_data["Chi_square"] > chi_square_contribution_percent * chi_square
-        )
-        messages = self._generate_message_modalities(
-            main_drifting_modalities_bool, output_data, test_data
-        )
+        passed = threshold is None or p_value > threshold
+        messages = None
+        # The drifting modalities are only reported when the test fails or has no threshold
+        if threshold is None or not passed:
+            messages = self._generate_message_modalities(
+                all_modalities,
+                chi_square_values > chi_square_contribution_percent * chi_square,
+                test_data,
+            )
         return messages, p_value, passed
 
     def test_drift_prediction_ks(
@@ -661,30 +866,22 @@ class DriftTests(AbstractTestCollection):
             messages:
                 Kolmogorov-Smirnov result message
         """
-        actual_slice.df.reset_index(drop=True, inplace=True)
-        reference_slice.df.reset_index(drop=True, inplace=True)
-
         assert (
             model.model_type != "classification"
             or classification_label in model.classification_labels
         ), f'"{classification_label}" is not part of model labels: {",".join(model.classification_labels)}'
 
-        prediction_reference = (
-            pd.Series(
-                model.run_predict(reference_slice).all_predictions[classification_label].values
-            )
-            if model.model_type == "classification"
-            else pd.Series(model.run_predict(reference_slice).prediction)
-        )
-        prediction_actual = (
-            pd.Series(model.run_predict(actual_slice).all_predictions[classification_label].values)
-            if model.model_type == "classification"
-            else pd.Series(model.run_predict(actual_slice).prediction)
-        )
+        if threshold is not None:
+            threshold = float(threshold)
+        prediction_reference = self._sorted_predictions(model, reference_slice, classification_label)
+        prediction_actual = self._sorted_predictions(model, actual_slice, classification_label)
 
-        result: Ks_2sampResult = self._calculate_ks(prediction_reference, prediction_actual)
+        result: Ks_2sampResult = self._calculate_ks(
+            prediction_reference, prediction_actual, presorted=True
+        )
 
-        passed = True if threshold is None else result.pvalue >= threshold
+        pvalue = float(result.pvalue)
+        passed = threshold is None or pvalue >= threshold
 
         messages = self._generate_message_ks(passed, result, threshold, "prediction")
 
@@ -693,7 +890,7 @@ class DriftTests(AbstractTestCollection):
                 actual_slices_size=[len(actual_slice)],
                 reference_slices_size=[len(reference_slice)],
                 passed=passed,
-                metric=result.pvalue,
+                metric=pvalue,
                 messages=messages,
             )
         )
@@ -750,23 +947,16 @@ class DriftTests(AbstractTestCollection):
                 Earth Mover's Distance value
 
         """
-        actual_slice.df.reset_index(drop=True, inplace=True)
-        reference_slice.df.reset_index(drop=True, inplace=True)
+        if threshold is not None:
+            threshold = float(threshold)
+        prediction_reference = self._sorted_predictions(model, reference_slice, classification_label)
+        prediction_actual = self._sorted_predictions(model, actual_slice, classification_label)
 
-        prediction_reference = (
-            model.run_predict(reference_slice).all_predictions[classification_label].values
-            if model.model_type == "classification"
-            else model.run_predict(reference_slice).prediction
+        metric = self._calculate_earth_movers_distance(
+            prediction_reference, prediction_actual, presorted=True
         )
-        prediction_actual = (
-            model.run_predict(actual_slice).all_predictions[classification_label].values
-            if model.model_type == "classification"
-            else model.run_predict(actual_slice).prediction
-        )
-
-        metric = self._calculate_earth_movers_distance(prediction_reference, prediction_actual)
 
-        passed = True if threshold is None else metric <= threshold
+        passed = threshold is None or metric <= threshold
         messages: Union[typing.List[TestMessage], None] = None
 
         if not passed:
@@ -781,7 +971,7 @@ class DriftTests(AbstractTestCollection):
             SingleTestResult(
                 actual_slices_size=[len(actual_slice)],
                 reference_slices_size=[len(reference_slice)],
-                passed=True if threshold is None else metric <= threshold,
+                passed=passed,
                 metric=metric,
                 messages=messages,
             )
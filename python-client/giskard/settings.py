@@ -23,6 +23,7 @@ class Settings(BaseSettings):
     max_workers: int = 10
     max_send_message_length_mb: int = 1024
     max_receive_message_length_mb: int = 1024
+    http2_stream_window_kb: int = 1024
     loglevel = "INFO"
 
     class Config:
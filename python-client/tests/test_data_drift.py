@@ -1,6 +1,9 @@
 import numpy as np
+import pandas as pd
 import pytest
+from scipy.stats import ks_2samp
 
+from giskard.ml_worker.testing.drift_tests import DriftTests
 from giskard.ml_worker.testing.functions import GiskardTestFunctions
 
 
@@ -368,3 +371,179 @@ def test_drift_data_ks_exception(data, threshold, expected_metric, column_name,
             column_name=column_name,
             threshold=threshold,
         )
+
+
+def test_drift_prediction_reuses_predictions(german_credit_data, german_credit_model):
+    prediction_function = german_credit_model.prediction_function
+    calls = []
+
+    def counting_prediction_function(df):
+        calls.append(len(df))
+        return prediction_function(df)
+
+    german_credit_model.prediction_function = counting_prediction_function
+    tests = GiskardTestFunctions()
+    reference_slice = german_credit_data.slice(lambda df: df.head(len(df) // 2))
+    actual_slice = german_credit_data.slice(lambda df: df.tail(len(df) // 2))
+
+    tests.drift.test_drift_prediction_psi(reference_slice, actual_slice, german_credit_model, threshold=1)
+    tests.drift.test_drift_prediction_chi_square(reference_slice, actual_slice, german_credit_model, threshold=0)
+    tests.drift.test_drift_prediction_ks(
+        reference_slice, actual_slice, german_credit_model, classification_label="Default", threshold=0.05
+    )
+    tests.drift.test_drift_prediction_earth_movers_distance(
+        reference_slice, actual_slice, german_credit_model, classification_label="Default", threshold=0.05
+    )
+
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("max_categories", [20, 2])
+def test_drift_data_categorical_dtype(german_credit_data, max_categories):
+    def run_tests(data):
+        tests = GiskardTestFunctions()
+        kwargs = dict(
+            reference_ds=data.slice(lambda df: df.head(len(df) // 2)),
+            actual_ds=data.slice(lambda df: df.tail(len(df) // 2)),
+            column_name="purpose",
+            max_categories=max_categories,
+        )
+        return tests.drift.test_drift_psi(**kwargs).metric, tests.drift.test_drift_chi_square(**kwargs).metric
+
+    expected_psi, expected_chi_square = run_tests(german_credit_data)
+    german_credit_data.df["purpose"] = german_credit_data.df["purpose"].astype("category")
+    psi, chi_square = run_tests(german_credit_data)
+
+    assert psi == pytest.approx(expected_psi)
+    assert chi_square == pytest.approx(expected_chi_square)
+
+
+@pytest.mark.parametrize("max_categories", [20, 2])
+def test_drift_data_psi_columns(german_credit_data, max_categories):
+    tests = GiskardTestFunctions()
+    reference_ds = german_credit_data.slice(lambda df: df.head(len(df) // 2))
+    actual_ds = german_credit_data.slice(lambda df: df.tail(len(df) // 2))
+    column_names = ["personal_status", "purpose", "housing"]
+
+    results = tests.drift.test_drift_psi_columns(
+        reference_ds=reference_ds,
+        actual_ds=actual_ds,
+        column_names=column_names,
+        max_categories=max_categories,
+        threshold=1,
+    )
+
+    for column_name in column_names:
+        column_result = tests.drift.test_drift_psi(
+            reference_ds=reference_ds,
+            actual_ds=actual_ds,
+            column_name=column_name,
+            max_categories=max_categories,
+            threshold=1,
+        )
+        assert float(results.props[column_name]) == pytest.approx(column_result.metric, abs=1e-6)
+    assert results.metric == pytest.approx(max(float(v) for v in results.props.values()), abs=1e-6)
+    assert results.passed
+
+
+def test_drift_data_ks_earth_movers_distance_share_sorted_values(german_credit_data):
+    tests = GiskardTestFunctions()
+    reference_ds = german_credit_data.slice(lambda df: df.head(len(df) // 2))
+    actual_ds = german_credit_data.slice(lambda df: df.tail(len(df) // 2))
+    reference_series = reference_ds.df["credit_amount"]
+    actual_series = actual_ds.df["credit_amount"]
+
+    ks_result = tests.drift.test_drift_ks(reference_ds, actual_ds, "credit_amount", threshold=0.05)
+    emd_result = tests.drift.test_drift_earth_movers_distance(reference_ds, actual_ds, "credit_amount", threshold=1)
+
+    assert ks_result.metric == pytest.approx(DriftTests._calculate_ks(actual_series, reference_series).pvalue)
+    assert emd_result.metric == pytest.approx(
+        DriftTests._calculate_earth_movers_distance(actual_series, reference_series)
+    )
+
+
+@pytest.mark.parametrize(
+    "max_categories,expected_actual,expected_reference",
+    [
+        (None, {"a": 1, "b": 1, "c": 3, "d": 1}, {"a": 1, "b": 3, "c": 3, "d": 1}),
+        # "b" and "c" are tied in the reference, "b" appears first
+        (2, {"b": 1, "c": 3}, {"b": 3, "c": 3}),
+    ],
+)
+def test_drift_frequencies_categorical_categories_order(max_categories, expected_actual, expected_reference):
+    def frequencies(actual_series, reference_series):
+        all_modalities, actual_frequencies, expected_frequencies = DriftTests._calculate_frequencies(
+            actual_series, reference_series, max_categories
+        )
+        modalities = [m for m in all_modalities if not DriftTests.other_modalities_regex.match(m)]
+        return (
+            {m: f for m, f in zip(all_modalities, actual_frequencies) if m in modalities},
+            {m: f for m, f in zip(all_modalities, expected_frequencies) if m in modalities},
+        )
+
+    reference_series = pd.Series(list("abcdccbb"))
+    actual_series = pd.Series(list("abcdcc"))
+    assert frequencies(actual_series, reference_series) == (expected_actual, expected_reference)
+    assert frequencies(
+        actual_series.astype(pd.CategoricalDtype(list("abcd"))),
+        reference_series.astype(pd.CategoricalDtype(list("dcba"))),
+    ) == (expected_actual, expected_reference)
+
+
+def test_drift_data_psi_columns_messages(enron_data):
+    tests = GiskardTestFunctions()
+    kwargs = dict(
+        reference_ds=enron_data.slice(lambda df: df.head(len(df) // 2)),
+        actual_ds=enron_data.slice(lambda df: df.tail(len(df) // 2)),
+        column_names=["Week_day"],
+    )
+
+    results = tests.drift.test_drift_psi_columns(**kwargs, threshold=2)
+    assert results.passed
+    assert not results.messages
+
+    results = tests.drift.test_drift_psi_columns(**kwargs, threshold=1)
+    assert not results.passed
+    assert len(results.messages) == 1
+    assert results.messages[0].text.startswith('The data of column "Week_day" is drifting')
+
+
+@pytest.mark.parametrize(
+    "reference_values,actual_values",
+    [
+        (np.random.default_rng(0).normal(size=20000), np.random.default_rng(1).normal(0.02, size=15000)),
+        (np.random.default_rng(2).integers(0, 50, size=50000), np.random.default_rng(3).integers(0, 50, size=9000)),
+        (np.random.default_rng(4).integers(0, 5, size=12000), np.random.default_rng(5).integers(1, 6, size=30000)),
+    ],
+)
+def test_drift_ks_large_samples(reference_values, actual_values):
+    assert max(len(reference_values), len(actual_values)) > DriftTests.ks_exact_max_size
+
+    result = DriftTests._calculate_ks(actual_values, reference_values)
+    expected = ks_2samp(reference_values, actual_values)
+
+    assert result.statistic == pytest.approx(expected.statistic)
+    assert result.pvalue == pytest.approx(expected.pvalue)
+
+
+@pytest.mark.parametrize(
+    "test_name,passing_threshold,failing_threshold",
+    [("test_drift_psi", 2, 1), ("test_drift_chi_square", 0, 0.5)],
+)
+def test_drift_data_modalities_messages(enron_data, test_name, passing_threshold, failing_threshold):
+    drift_test = getattr(GiskardTestFunctions().drift, test_name)
+    kwargs = dict(
+        reference_ds=enron_data.slice(lambda df: df.head(len(df) // 2)),
+        actual_ds=enron_data.slice(lambda df: df.tail(len(df) // 2)),
+        column_name="Week_day",
+    )
+
+    results = drift_test(**kwargs, threshold=passing_threshold)
+    assert results.passed
+    assert not results.messages
+
+    for threshold in [failing_threshold, None]:
+        results = drift_test(**kwargs, threshold=threshold)
+        assert results.passed == (threshold is None)
+        assert len(results.messages) == 1
+        assert results.messages[0].text.startswith("The data is drifting for the following modalities")
@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+
+from giskard.ml_worker.generated.ml_worker_pb2 import (
+    Chunk,
+    FilterDatasetMetadata,
+    FilterDatasetRequest,
+    StatusCode,
+)
+from giskard.ml_worker.server.ml_worker_service import MLWorkerServiceImpl
+
+df = pd.DataFrame(
+    {
+        "name": ["alice", "bob", "carol", "dave"],
+        "age": [35, 20, 45, 25],
+        "flag": [True, False, True, False],
+    }
+)
+
+
+def filter_dataset(function):
+    requests = [
+        FilterDatasetRequest(
+            meta=FilterDatasetMetadata(
+                function=function,
+                headers=",".join(df.columns),
+                column_types={c: df[c].dtype.name for c in df.columns},
+            )
+        ),
+        FilterDatasetRequest(
+            data=Chunk(content=df.to_csv(index=False, header=False).encode("utf-8")), idx=0
+        ),
+    ]
+    return MLWorkerServiceImpl().filterDataset(iter(requests), None)
+
+
+@pytest.mark.parametrize(
+    "function,expected_rows",
+    [
+        ("def filter_row(row):\n    return row['age'] > 30", [0, 2]),
+        # row.name is the row's index label, not the "name" column
+        ("def filter_row(row):\n    return row.name == 'bob'", []),
+        # ~ on a Python bool is a non-zero int, which is truthy
+        ("def filter_row(row):\n    return ~row['flag']", [0, 1, 2, 3]),
+        (
+            "def filter_row(row):\n"
+            "    row['age'] = row['age'] + 30\n"
+            "    if isinstance(row, pd.DataFrame):\n"
+            "        raise ValueError()\n"
+            "    return row['age'] > 70",
+            [2],
+        ),
+        ("def filter_df(df):\n    return df['age'] > 30", [0, 2]),
+        ("def filter_df(df):\n    return ~df['flag'].to_numpy()", [1, 3]),
+    ],
+)
+def test_filter_dataset(function, expected_rows):
+    responses = list(filter_dataset("import pandas as pd\n" + function))
+
+    assert [r.code for r in responses] == [
+        StatusCode.Ready,
+        StatusCode.Next,
+        StatusCode.Ok,
+    ]
+    assert list(responses[1].rows) == expected_rows
+
+
+@pytest.mark.parametrize(
+    "function",
+    [
+        "def filter_df(df):\n    return df['age']",
+        # One value per column instead of one per row
+        "def filter_df(df):\n    return (df.dtypes == 'int64').to_numpy()",
+    ],
+)
+def test_filter_dataset_filter_df_invalid_mask(function):
+    responses = filter_dataset(function)
+
+    assert next(responses).code == StatusCode.Ready
+    response = next(responses)
+    assert response.code == StatusCode.Failed
+    assert "boolean mask" in response.error_message
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from giskard.ml_worker.generated.ml_worker_pb2 import DataFrame, DataRow
+from giskard.ml_worker.server.ml_worker_service import MLWorkerServiceImpl
+
+
+def test_proto_df_to_pandas_df_missing_columns():
+    proto_df = DataFrame(
+        rows=[
+            DataRow(columns={"age": "35", "name": "alice"}),
+            DataRow(columns={"age": "20", "city": "Paris"}),
+        ]
+    )
+
+    df = MLWorkerServiceImpl.proto_df_to_pandas_df(proto_df)
+
+    pd.testing.assert_frame_equal(
+        df,
+        pd.DataFrame({"age": ["35", "20"], "name": ["alice", np.nan], "city": [np.nan, "Paris"]}),
+        # Protobuf maps don't keep the keys' insertion order
+        check_like=True,
+    )
+    # Missing keys aren't inserted into the request rows
+    assert [dict(r.columns) for r in proto_df.rows] == [
+        {"age": "35", "name": "alice"},
+        {"age": "20", "city": "Paris"},
+    ]